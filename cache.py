@@ -199,6 +199,9 @@ def init_db(path: str) -> None:
             last_name TEXT,
             raw_json TEXT
         );
+
+        CREATE INDEX IF NOT EXISTS idx_orders_completed ON orders(completed_date);
+        CREATE INDEX IF NOT EXISTS idx_order_items_order ON order_items(order_id);
         """
         )
         db.commit()
@@ -424,7 +427,7 @@ def refresh_orders_cache(path: str, start_date: date, end_date: date) -> None:
             )
 
     set_cache_status(path, refresh_page="0", refresh_fetched="0", refresh_total="0", refresh_detail_current="", refresh_detail_total="")
-    orders = client.fetch_orders(start_date, end_date, progress_cb=_progress)
+    orders = client.fetch_orders_list(start_date, end_date, progress_cb=_progress)
     _update_rate_limit_status(path, client.rate_limit)
 
     db = sqlite3.connect(path, timeout=30)
@@ -1,8 +1,15 @@
 ﻿from __future__ import annotations
 
-from datetime import date
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from datetime import date, timedelta
+from functools import lru_cache
 from io import BytesIO
 import base64
+import copy
+import os
+import sqlite3
+import threading
 
 import matplotlib
 matplotlib.use("Agg")
@@ -12,11 +19,20 @@ matplotlib.rcParams.update(
         "font.sans-serif": ["Arial"],
     }
 )
-import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+import numpy as np
 import pandas as pd
 
 from cache import get_db
 
+CHART_WORKERS = 4
+CHART_DPI = 110
+REPORT_CACHE_SIZE = 32
+
+_chart_executor = ThreadPoolExecutor(max_workers=CHART_WORKERS, thread_name_prefix="report-charts")
+_chart_figures = threading.local()
+
 
 def _money0(value: float) -> str:
     return f"${value:,.0f}"
@@ -30,35 +46,209 @@ def _pct(value: float) -> str:
     return f"{value * 100:.1f}%"
 
 
+def _chart_figure(figsize: tuple[float, float]):
+    # Build figures without pyplot so charts can render concurrently in worker threads.
+    # Each worker keeps one figure per size and clears it between renders.
+    figures = getattr(_chart_figures, "by_size", None)
+    if figures is None:
+        figures = _chart_figures.by_size = {}
+    fig = figures.get(figsize)
+    if fig is None:
+        fig = Figure(figsize=figsize)
+        FigureCanvasAgg(fig)
+        figures[figsize] = fig
+    else:
+        fig.clear()
+    return fig, fig.subplots()
+
+
 def _fig_to_base64(fig) -> str:
     buffer = BytesIO()
-    fig.savefig(buffer, format="png", dpi=160, bbox_inches="tight")
-    plt.close(fig)
+    # tight_layout once instead of bbox_inches="tight", which renders the figure twice.
+    fig.tight_layout()
+    fig.savefig(buffer, format="png", dpi=CHART_DPI)
     buffer.seek(0)
     return base64.b64encode(buffer.read()).decode("utf-8")
 
 
-def _load_data(db_path: str, start_date: date, end_date: date) -> tuple[pd.DataFrame, pd.DataFrame]:
+def _records(df: pd.DataFrame, limit: int) -> list[dict]:
+    cols = df.columns.tolist()
+    arrs = [df[col].to_numpy()[:limit].tolist() for col in cols]
+    return [dict(zip(cols, vals)) for vals in zip(*arrs)]
+
+
+def _avg_bottle_sale(df: pd.DataFrame) -> pd.Series:
+    per_bottle = df["net_sales"] / (df["cases_sold"] * 12)
+    return per_bottle.where(df["cases_sold"] != 0, 0.0)
+
+
+def _open_db(db_path: str) -> sqlite3.Connection:
     db = get_db(db_path)
-    orders = pd.read_sql_query(
-        "SELECT * FROM orders",
-        db,
-    )
-    items = pd.read_sql_query(
-        "SELECT * FROM order_items",
-        db,
-    )
-    db.close()
+    # Reports are read-heavy; favour a large page cache and memory-mapped reads.
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA mmap_size=268435456")
+    db.execute("PRAGMA cache_size=-65536")
+    db.execute("PRAGMA temp_store=MEMORY")
+    return db
+
+
+def _db_version(db_path: str) -> tuple:
+    # Writers use WAL mode, so recent changes may only touch the -wal file until checkpoint.
+    version = []
+    for path in (db_path, f"{db_path}-wal"):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            version.append(None)
+        else:
+            version.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(version)
+
+
+def _date_params(start_date: date, end_date: date) -> tuple[str, str]:
+    # completed_date is stored as an ISO string, so a half-open string range matches
+    # date(completed_date) BETWEEN start AND end while still using idx_orders_completed.
+    return start_date.isoformat(), (end_date + timedelta(days=1)).isoformat()
+
+
+def _load_orders(db_path: str, start_date: date, end_date: date) -> pd.DataFrame:
+    params = _date_params(start_date, end_date)
+    with closing(_open_db(db_path)) as db:
+        orders = pd.read_sql_query(
+            """
+            SELECT
+                order_id,
+                completed_date,
+                units,
+                sub_total,
+                order_total,
+                taxes,
+                customer_id,
+                pickup
+            FROM orders
+            WHERE completed_date >= ? AND completed_date < ?
+            """,
+            db,
+            params=params,
+        )
     orders["completed_date"] = pd.to_datetime(orders["completed_date"], errors="coerce")
     orders["completed_local"] = orders["completed_date"].dt.date
-    mask = (orders["completed_local"] >= start_date) & (orders["completed_local"] <= end_date)
-    orders = orders[mask]
-    items = items[items["order_id"].isin(orders["order_id"])]
-    return orders, items
+    return orders
+
+
+def _load_aggregates(db_path: str, start_date: date, end_date: date) -> dict[str, pd.DataFrame]:
+    # orders already has net_sales/units columns, so HAVING/ORDER BY repeat the aggregate
+    # rather than referring to the (shadowed) output alias.
+    params = _date_params(start_date, end_date)
+    with closing(_open_db(db_path)) as db:
+        monthly = pd.read_sql_query(
+            """
+            SELECT
+                strftime('%Y-%m-01', completed_date) AS month,
+                TOTAL(sub_total) AS net_sales,
+                COUNT(order_id) AS orders,
+                TOTAL(units) AS units
+            FROM orders
+            WHERE completed_date >= ? AND completed_date < ?
+            GROUP BY month
+            HAVING month IS NOT NULL
+            ORDER BY month
+            """,
+            db,
+            params=params,
+        )
+        channel = pd.read_sql_query(
+            """
+            SELECT order_type, TOTAL(sub_total) AS net_sales
+            FROM orders
+            WHERE completed_date >= ? AND completed_date < ? AND order_type IS NOT NULL
+            GROUP BY order_type
+            HAVING TOTAL(sub_total) > 0
+            ORDER BY TOTAL(sub_total) DESC
+            """,
+            db,
+            params=params,
+        )
+        states = pd.read_sql_query(
+            """
+            SELECT ship_state, TOTAL(sub_total) AS net_sales
+            FROM orders
+            WHERE completed_date >= ? AND completed_date < ? AND pickup = 0 AND ship_state IS NOT NULL
+            GROUP BY ship_state
+            ORDER BY TOTAL(sub_total) DESC
+            LIMIT 10
+            """,
+            db,
+            params=params,
+        )
+        top_units = pd.read_sql_query(
+            """
+            SELECT oi.sku, oi.product_name, TOTAL(oi.quantity) AS units
+            FROM order_items oi
+            JOIN orders o ON oi.order_id = o.order_id
+            WHERE o.completed_date >= ? AND o.completed_date < ?
+                AND oi.sku IS NOT NULL AND oi.product_name IS NOT NULL
+            GROUP BY oi.sku, oi.product_name
+            ORDER BY TOTAL(oi.quantity) DESC
+            LIMIT 10
+            """,
+            db,
+            params=params,
+        )
+        # Allocate order-level net sales to items by price share, falling back to quantity
+        # share, to avoid relying on item net_sales.
+        top_rev = pd.read_sql_query(
+            """
+            WITH lines AS (
+                SELECT
+                    oi.order_id,
+                    oi.sku,
+                    oi.product_name,
+                    COALESCE(o.sub_total, 0) AS order_net_sales,
+                    COALESCE(oi.quantity, 0) AS quantity,
+                    COALESCE(oi.price, 0) * COALESCE(oi.quantity, 0) AS line_value
+                FROM order_items oi
+                JOIN orders o ON oi.order_id = o.order_id
+                WHERE o.completed_date >= ? AND o.completed_date < ?
+            ),
+            order_lines AS (
+                SELECT
+                    *,
+                    TOTAL(line_value) OVER (PARTITION BY order_id) AS value_by_order,
+                    TOTAL(quantity) OVER (PARTITION BY order_id) AS qty_by_order
+                FROM lines
+            )
+            SELECT
+                sku,
+                product_name,
+                TOTAL(
+                    CASE
+                        WHEN value_by_order > 0 THEN order_net_sales * line_value / value_by_order
+                        WHEN qty_by_order > 0 THEN order_net_sales * quantity / qty_by_order
+                        ELSE 0
+                    END
+                ) AS net_sales
+            FROM order_lines
+            WHERE sku IS NOT NULL AND product_name IS NOT NULL
+            GROUP BY sku, product_name
+            ORDER BY net_sales DESC
+            LIMIT 10
+            """,
+            db,
+            params=params,
+        )
+    monthly["month"] = pd.to_datetime(monthly["month"], format="%Y-%m-%d")
+    return {"monthly": monthly, "channel": channel, "states": states, "top_units": top_units, "top_rev": top_rev}
 
 
 def _build_report_core(db_path: str, start_date: date, end_date: date) -> dict:
-    orders, items = _load_data(db_path, start_date, end_date)
+    core = _build_report_core_cached(db_path, _db_version(db_path), start_date, end_date)
+    return copy.deepcopy(core)
+
+
+@lru_cache(maxsize=REPORT_CACHE_SIZE)
+def _build_report_core_cached(db_path: str, db_version: tuple, start_date: date, end_date: date) -> dict:
+    orders = _load_orders(db_path, start_date, end_date)
     if orders.empty:
         return {
             "kpis": [],
@@ -67,70 +257,42 @@ def _build_report_core(db_path: str, start_date: date, end_date: date) -> dict:
             "empty": True,
         }
 
-    orders["completed_date"] = pd.to_datetime(orders["completed_date"], errors="coerce")
-    orders["month"] = orders["completed_date"].dt.to_period("M").dt.to_timestamp()
-
     for col in ("units", "sub_total", "order_total", "taxes"):
         orders[col] = pd.to_numeric(orders[col], errors="coerce").fillna(0)
 
     total_orders = len(orders)
-    total_units = orders["units"].sum()
-    net_sales = orders["sub_total"].sum()
-    order_total = orders["order_total"].sum()
-    taxes = orders["taxes"].sum()
+    sums = orders[["units", "sub_total", "order_total", "taxes"]].sum()
+    total_units = sums["units"]
+    net_sales = sums["sub_total"]
+    order_total = sums["order_total"]
+    taxes = sums["taxes"]
     aov = net_sales / total_orders if total_orders else 0
     avg_bottle_price = net_sales / total_units if total_units else 0
 
+    orders["customer_id"] = orders["customer_id"].astype("category")
     unique_customers = orders["customer_id"].nunique()
-    repeat_customers = orders.groupby("customer_id")["order_id"].nunique().gt(1).sum() if unique_customers else 0
+    repeat_customers = 0
+    if unique_customers:
+        customer_orders = orders[["customer_id", "order_id"]].drop_duplicates()
+        repeat_customers = int((customer_orders["customer_id"].value_counts() > 1).sum())
     repeat_rate = repeat_customers / unique_customers if unique_customers else 0
     avg_bottles_per_customer = total_units / unique_customers if unique_customers else 0
 
-    pickup_count = (orders["pickup"] == 1).sum()
-    shipping_count = (orders["pickup"] == 0).sum()
+    # pickup is always stored as 1/0, so every non-pickup order is a shipped order.
+    pickup_count = int((orders["pickup"] == 1).sum())
+    shipping_count = total_orders - pickup_count
 
-    monthly = orders.groupby("month").agg(
-        net_sales=("sub_total", "sum"),
-        orders=("order_id", "count"),
-        units=("units", "sum"),
-    ).reset_index()
+    # Monthly, channel, state and product rankings are aggregates, so let SQLite compute them.
+    aggregates = _load_aggregates(db_path, start_date, end_date)
+    monthly = aggregates["monthly"]
 
     peak_row = monthly.loc[monthly["net_sales"].idxmax()] if not monthly.empty else None
     low_row = monthly.loc[monthly["net_sales"].idxmin()] if not monthly.empty else None
 
-    channel = orders.groupby("order_type").agg(net_sales=("sub_total", "sum")).reset_index()
-    channel = channel[channel["net_sales"] > 0].sort_values("net_sales", ascending=False)
-
-    # Allocate order-level net sales to items to avoid relying on item net_sales.
-    items_alloc = items.merge(orders[["order_id", "sub_total"]], on="order_id", how="left")
-    items_alloc["quantity"] = pd.to_numeric(items_alloc.get("quantity", 0), errors="coerce").fillna(0)
-    items_alloc["price"] = pd.to_numeric(items_alloc.get("price", 0), errors="coerce").fillna(0)
-    items_alloc["order_net_sales"] = pd.to_numeric(items_alloc.get("sub_total", 0), errors="coerce").fillna(0)
-    items_alloc["line_value"] = items_alloc["price"] * items_alloc["quantity"]
-    value_by_order = items_alloc.groupby("order_id")["line_value"].transform("sum")
-    qty_by_order = items_alloc.groupby("order_id")["quantity"].transform("sum")
-    items_alloc["calc_sales"] = 0.0
-    has_value = value_by_order > 0
-    items_alloc.loc[has_value, "calc_sales"] = (
-        items_alloc.loc[has_value, "order_net_sales"] * (items_alloc.loc[has_value, "line_value"] / value_by_order[has_value])
-    )
-    has_qty = (~has_value) & (qty_by_order > 0)
-    items_alloc.loc[has_qty, "calc_sales"] = (
-        items_alloc.loc[has_qty, "order_net_sales"] * (items_alloc.loc[has_qty, "quantity"] / qty_by_order[has_qty])
-    )
-    top_rev = (
-        items_alloc.groupby(["sku", "product_name"])
-        .agg(net_sales=("calc_sales", "sum"))
-        .reset_index()
-        .sort_values("net_sales", ascending=False)
-        .head(10)
-    )
-
-    top_units = items.groupby(["sku", "product_name"]).agg(units=("quantity", "sum")).reset_index()
-    top_units = top_units.sort_values("units", ascending=False).head(10)
-
-    states = orders[orders["pickup"] == 0].groupby("ship_state").agg(net_sales=("sub_total", "sum")).reset_index()
-    states = states.sort_values("net_sales", ascending=False).head(10)
+    channel = aggregates["channel"]
+    top_rev = aggregates["top_rev"]
+    top_units = aggregates["top_units"]
+    states = aggregates["states"]
 
     kpis = [
         ("Net Sales", _money0(net_sales)),
@@ -152,14 +314,20 @@ def _build_report_core(db_path: str, start_date: date, end_date: date) -> dict:
     if low_row is not None:
         kpis.append(("Lowest Month", f"{low_row['month'].strftime('%b %Y')} ({_money0(low_row['net_sales'])})"))
 
+    month_labels = monthly["month"].dt.strftime("%b %Y").to_numpy()
     table = [
         {
-            "month": row["month"].strftime("%b %Y"),
-            "net_sales": _money0(row["net_sales"]),
-            "orders": f"{int(row['orders']):,}",
-            "units": f"{int(row['units']):,}",
+            "month": label,
+            "net_sales": _money0(month_sales),
+            "orders": f"{int(month_orders):,}",
+            "units": f"{int(month_units):,}",
         }
-        for _, row in monthly.iterrows()
+        for label, month_sales, month_orders, month_units in zip(
+            month_labels,
+            monthly["net_sales"].to_numpy(),
+            monthly["orders"].to_numpy(),
+            monthly["units"].to_numpy(),
+        )
     ]
 
     return {
@@ -196,7 +364,7 @@ def build_report(db_path: str, start_date: date, end_date: date) -> dict:
     unique_customers = core["unique_customers"]
 
     def _native_list(values, cast=float):
-        return [cast(v) for v in values]
+        return values.astype(cast).tolist()
 
     chart_data = {
         "monthly": {
@@ -237,26 +405,32 @@ def build_report(db_path: str, start_date: date, end_date: date) -> dict:
 
 
 def build_report_timeseries(db_path: str, start_date: date, end_date: date, granularity: str = "month") -> dict:
-    orders, _ = _load_data(db_path, start_date, end_date)
+    timeseries = _build_report_timeseries_cached(db_path, _db_version(db_path), start_date, end_date, granularity)
+    return copy.deepcopy(timeseries)
+
+
+@lru_cache(maxsize=REPORT_CACHE_SIZE)
+def _build_report_timeseries_cached(
+    db_path: str, db_version: tuple, start_date: date, end_date: date, granularity: str
+) -> dict:
+    orders = _load_orders(db_path, start_date, end_date)
     if orders.empty:
         return {"labels": [], "net_sales": [], "orders": [], "units": []}
 
-    orders["completed_date"] = pd.to_datetime(orders["completed_date"], errors="coerce")
-    orders["completed_local"] = orders["completed_date"].dt.date
     for col in ("units", "sub_total"):
         orders[col] = pd.to_numeric(orders[col], errors="coerce").fillna(0)
 
     if granularity == "day":
-        grouped = orders.groupby("completed_local").agg(
+        grouped = orders.groupby("completed_local", sort=False, observed=True).agg(
             net_sales=("sub_total", "sum"),
             orders=("order_id", "count"),
             units=("units", "sum"),
         ).reset_index()
         grouped = grouped.sort_values("completed_local")
-        labels = [d.strftime("%b %d, %Y") for d in pd.to_datetime(grouped["completed_local"]).dt.date]
+        labels = [d.strftime("%b %d, %Y") for d in grouped["completed_local"]]
     else:
         orders["month"] = orders["completed_date"].dt.to_period("M").dt.to_timestamp()
-        grouped = orders.groupby("month").agg(
+        grouped = orders.groupby("month", sort=False, observed=True).agg(
             net_sales=("sub_total", "sum"),
             orders=("order_id", "count"),
             units=("units", "sum"),
@@ -282,15 +456,7 @@ def build_report_pdf(db_path: str, start_date: date, end_date: date) -> dict:
             "empty": True,
         }
 
-    chart_images = {
-        "monthly_net_sales": _chart_monthly_net_sales(core["monthly"]),
-        "orders_units": _chart_orders_units(core["monthly"]),
-        "sales_by_channel": _chart_sales_by_channel(core["channel"]),
-        "top_products_revenue": _chart_top_products(core["top_rev"], "net_sales", "Top Products by Revenue"),
-        "top_products_units": _chart_top_products(core["top_units"], "units", "Top Products by Units"),
-        "top_states": _chart_top_states(core["states"]),
-        "customer_mix": _chart_customer_mix(core["unique_customers"], core["repeat_customers"]),
-    }
+    chart_images = dict(_render_pdf_charts(db_path, _db_version(db_path), start_date, end_date))
 
     return {
         "kpis": core["kpis"],
@@ -300,147 +466,180 @@ def build_report_pdf(db_path: str, start_date: date, end_date: date) -> dict:
     }
 
 
-def build_products_report(db_path: str, start_date: date, end_date: date, unit: str = "case") -> dict:
-    db = get_db(db_path)
-    orders = pd.read_sql_query(
-        "SELECT order_id, order_type, sub_total, completed_date FROM orders",
-        db,
-    )
-    items = pd.read_sql_query(
-        """
-        SELECT order_id, sku, product_name, title, quantity, net_sales, price
-        FROM order_items
-        """,
-        db,
-    )
-    inventory = pd.read_sql_query(
-        "SELECT sku, current_inventory, inventory_pool FROM inventory",
-        db,
-    )
-    db.close()
+@lru_cache(maxsize=REPORT_CACHE_SIZE)
+def _render_pdf_charts(db_path: str, db_version: tuple, start_date: date, end_date: date) -> dict[str, str]:
+    # Charts only depend on the cached core, so repeat PDF exports reuse the rendered images.
+    core = _build_report_core_cached(db_path, db_version, start_date, end_date)
+    chart_specs = {
+        "monthly_net_sales": (_chart_monthly_net_sales, (core["monthly"],)),
+        "orders_units": (_chart_orders_units, (core["monthly"],)),
+        "sales_by_channel": (_chart_sales_by_channel, (core["channel"],)),
+        "top_products_revenue": (_chart_top_products, (core["top_rev"], "net_sales", "Top Products by Revenue")),
+        "top_products_units": (_chart_top_products, (core["top_units"], "units", "Top Products by Units")),
+        "top_states": (_chart_top_states, (core["states"],)),
+        "customer_mix": (_chart_customer_mix, (core["unique_customers"], core["repeat_customers"])),
+    }
+    futures = {name: _chart_executor.submit(fn, *args) for name, (fn, args) in chart_specs.items()}
+    chart_images = {name: future.result() for name, future in futures.items()}
+    return chart_images
+
 
+def build_products_report(db_path: str, start_date: date, end_date: date, unit: str = "case") -> dict:
+    report = _build_products_report_cached(db_path, _db_version(db_path), start_date, end_date, unit)
+    return copy.deepcopy(report)
+
+
+@lru_cache(maxsize=REPORT_CACHE_SIZE)
+def _build_products_report_cached(
+    db_path: str, db_version: tuple, start_date: date, end_date: date, unit: str
+) -> dict:
+    with closing(_open_db(db_path)) as db:
+        orders = pd.read_sql_query(
+            "SELECT order_id, order_type, sub_total, completed_date FROM orders",
+            db,
+        )
+        items = pd.read_sql_query(
+            """
+            SELECT
+                order_id,
+                sku,
+                product_name,
+                title,
+                COALESCE(CAST(quantity AS REAL), 0) AS quantity,
+                COALESCE(CAST(net_sales AS REAL), 0) AS net_sales,
+                COALESCE(CAST(price AS REAL), 0) AS price
+            FROM order_items
+            """,
+            db,
+        )
+        inventory = pd.read_sql_query(
+            "SELECT sku, current_inventory, inventory_pool FROM inventory",
+            db,
+        )
     if orders.empty or items.empty:
         return {"empty": True, "skus": [], "top_skus": [], "inventory": []}
 
+    # Zero-quantity lines carry no cases or allocated sales; drop them before grouping.
+    items = items.loc[items["quantity"].to_numpy() != 0]
+
     orders["completed_date"] = pd.to_datetime(orders["completed_date"], errors="coerce")
     orders["completed_local"] = orders["completed_date"].dt.date
     orders = orders[(orders["completed_local"] >= start_date) & (orders["completed_local"] <= end_date)]
-    if "payment_status" not in orders.columns:
-        orders["payment_status"] = ""
-    orders = orders.rename(columns={"sub_total": "order_net_sales"})
     items = items[items["order_id"].isin(orders["order_id"])]
-    merged = items.merge(orders, on="order_id", how="left")
+    # Only the order type and order net sales are needed per item, so map them
+    # directly instead of widening every item row with a full merge.
+    order_ids = orders["order_id"].to_numpy()
+    order_type_map = dict(zip(order_ids, orders["order_type"].to_numpy()))
+    order_sales_map = dict(zip(order_ids, orders["sub_total"].to_numpy()))
+    merged = items.assign(
+        order_type=items["order_id"].map(order_type_map),
+        order_net_sales=items["order_id"].map(order_sales_map),
+    )
     merged["sku"] = merged["sku"].fillna("")
     merged["product_name"] = merged["product_name"].fillna("")
     merged["title"] = merged["title"].fillna("")
-    merged["product_name"] = merged.apply(
-        lambda row: row["product_name"] if row["product_name"] else row["title"], axis=1
-    )
-    merged["quantity"] = pd.to_numeric(merged["quantity"], errors="coerce").fillna(0)
+    merged["product_name"] = merged["product_name"].mask(merged["product_name"].eq(""), merged["title"])
+    # Low-cardinality keys group on integer codes as categoricals.
+    for col in ("sku", "product_name", "order_type"):
+        merged[col] = merged[col].astype("category")
     merged["cases_sold"] = merged["quantity"] / 12
-    merged["net_sales"] = pd.to_numeric(merged["net_sales"], errors="coerce").fillna(0)
-    merged["price"] = pd.to_numeric(merged["price"], errors="coerce").fillna(0)
     merged["order_net_sales"] = pd.to_numeric(merged.get("order_net_sales", 0), errors="coerce").fillna(0)
 
     # Allocate order-level net sales across items by price share, fallback to quantity share.
     merged["line_value"] = merged["price"] * merged["quantity"]
-    value_by_order = merged.groupby("order_id")["line_value"].transform("sum")
-    qty_by_order = merged.groupby("order_id")["quantity"].transform("sum")
-    merged["calc_sales"] = 0.0
-    has_value = value_by_order > 0
-    merged.loc[has_value, "calc_sales"] = (
-        merged.loc[has_value, "order_net_sales"] * (merged.loc[has_value, "line_value"] / value_by_order[has_value])
-    )
-    has_qty = (~has_value) & (qty_by_order > 0)
-    merged.loc[has_qty, "calc_sales"] = (
-        merged.loc[has_qty, "order_net_sales"] * (merged.loc[has_qty, "quantity"] / qty_by_order[has_qty])
-    )
+    order_sums = merged.groupby("order_id", sort=False, observed=True)[["line_value", "quantity"]].transform("sum")
+    value_by_order = order_sums["line_value"]
+    qty_by_order = order_sums["quantity"]
+    value_totals = value_by_order.to_numpy(dtype=float)
+    qty_totals = qty_by_order.to_numpy(dtype=float)
+    has_value = value_totals > 0
+    has_qty = ~has_value & (qty_totals > 0)
+    share = np.zeros(len(merged))
+    np.divide(merged["line_value"].to_numpy(dtype=float), value_totals, out=share, where=has_value)
+    np.divide(merged["quantity"].to_numpy(dtype=float), qty_totals, out=share, where=has_qty)
+    merged["calc_sales"] = merged["order_net_sales"].to_numpy(dtype=float) * share
 
     grouped = (
-        merged.groupby(["sku", "product_name", "order_type"], dropna=False)
+        merged.groupby(["sku", "product_name", "order_type"], dropna=False, sort=False, observed=True)
         .agg(cases_sold=("cases_sold", "sum"), net_sales=("calc_sales", "sum"))
         .reset_index()
     )
-    grouped["avg_sale"] = grouped.apply(
-        lambda row: row["net_sales"] / (row["cases_sold"] * 12) if row["cases_sold"] else 0, axis=1
-    )
+    grouped["avg_sale"] = _avg_bottle_sale(grouped)
     qty_factor = 1 if unit == "case" else 12
     grouped["display_qty"] = grouped["cases_sold"] * qty_factor
 
     sku_totals = (
-        grouped.groupby(["sku", "product_name"])
+        grouped.groupby(["sku", "product_name"], sort=False, observed=True)
         .agg(cases_sold=("cases_sold", "sum"), net_sales=("net_sales", "sum"))
         .reset_index()
     )
-    sku_totals["avg_sale"] = sku_totals.apply(
-        lambda row: row["net_sales"] / (row["cases_sold"] * 12) if row["cases_sold"] else 0, axis=1
-    )
+    sku_totals["avg_sale"] = _avg_bottle_sale(sku_totals)
     sku_totals["display_qty"] = sku_totals["cases_sold"] * qty_factor
 
     skus = []
-    for _, row in sku_totals.sort_values("cases_sold", ascending=False).iterrows():
-        sku = row["sku"] or "Unknown SKU"
-        name = row["product_name"] or sku
-        rows = grouped[(grouped["sku"] == row["sku"]) & (grouped["product_name"] == row["product_name"])]
+    rows_by_sku = dict(list(grouped.groupby(["sku", "product_name"], sort=False, observed=True)))
+    no_rows = grouped.iloc[0:0]
+    ranked_skus = sku_totals.sort_values("cases_sold", ascending=False)
+    for row in ranked_skus.itertuples(index=False):
+        sku = row.sku or "Unknown SKU"
+        name = row.product_name or sku
+        rows = rows_by_sku.get((row.sku, row.product_name), no_rows)
         rows = rows.sort_values("cases_sold", ascending=False)
         max_avg = rows["avg_sale"].max() if not rows.empty else 0
         tol = 1e-6
         detail_rows = [
             {
-                "order_type": r["order_type"] or "Unknown",
-                "sku": r["sku"],
-                "name": r["product_name"] or r["sku"],
-                "cases_sold": float(r["display_qty"]),
-                "net_sales": float(r["net_sales"]),
-                "avg_sale": float(r["avg_sale"]),
-                "is_top_avg": abs(float(r["avg_sale"]) - float(max_avg)) <= tol if max_avg else False,
+                "order_type": r.order_type or "Unknown",
+                "sku": r.sku,
+                "name": r.product_name or r.sku,
+                "cases_sold": float(r.display_qty),
+                "net_sales": float(r.net_sales),
+                "avg_sale": float(r.avg_sale),
+                "is_top_avg": abs(float(r.avg_sale) - float(max_avg)) <= tol if max_avg else False,
             }
-            for _, r in rows.iterrows()
+            for r in rows.itertuples(index=False)
         ]
         skus.append(
             {
                 "sku": sku,
                 "name": name,
-                "total_cases": float(row["display_qty"]),
-                "total_sales": float(row["net_sales"]),
-                "avg_sale": float(row["avg_sale"]),
+                "total_cases": float(row.display_qty),
+                "total_sales": float(row.net_sales),
+                "avg_sale": float(row.avg_sale),
                 "rows": detail_rows,
             }
         )
 
-    top_skus = sku_totals.sort_values("cases_sold", ascending=False).head(15).to_dict("records")
+    top_skus = _records(ranked_skus, 15)
     for row in top_skus:
         row["display_qty"] = row["cases_sold"] * qty_factor
     inventory_summary = []
+    label_summary = []
     if not inventory.empty:
-        inv = inventory.copy()
-        inv["current_inventory"] = pd.to_numeric(inv["current_inventory"], errors="coerce").fillna(0)
+        inv = inventory.assign(
+            current_inventory=pd.to_numeric(inventory["current_inventory"], errors="coerce").fillna(0)
+        )
         inv = inv[~inv["inventory_pool"].fillna("").str.contains("library", case=False)]
+        # Strip a leading "NN." prefix with string slices rather than a regex.
+        sku_text = inv["sku"].astype(str)
+        has_prefix = sku_text.str[:2].str.isdigit() & sku_text.str[2:3].eq(".")
+        inv = inv.assign(base_sku=sku_text.str[3:].where(has_prefix, sku_text))
         inventory_summary = (
-            inv.groupby("sku")
+            inv.groupby("sku", sort=False, observed=True)
             .agg(total_inventory=("current_inventory", "sum"))
             .reset_index()
             .assign(total_inventory=lambda df: df["total_inventory"] / (12 if unit == "case" else 1))
-            .sort_values("total_inventory", ascending=False)
-            .head(30)
-            .to_dict("records")
+            .nlargest(30, "total_inventory")
         )
-
-    label_summary = []
-    if not inventory.empty:
-        inv = inventory.copy()
-        inv["current_inventory"] = pd.to_numeric(inv["current_inventory"], errors="coerce").fillna(0)
-        inv = inv[~inv["inventory_pool"].fillna("").str.contains("library", case=False)]
-        inv["base_sku"] = inv["sku"].astype(str).str.replace(r"^\d{2}\.", "", regex=True)
+        inventory_summary = _records(inventory_summary, 30)
         label_summary = (
-            inv.groupby("base_sku")
+            inv.groupby("base_sku", sort=False, observed=True)
             .agg(total_inventory=("current_inventory", "sum"))
             .reset_index()
             .assign(total_inventory=lambda df: df["total_inventory"] / (12 if unit == "case" else 1))
-            .sort_values("total_inventory", ascending=False)
-            .head(30)
-            .to_dict("records")
+            .nlargest(30, "total_inventory")
         )
+        label_summary = _records(label_summary, 30)
 
     return {
         "empty": False,
@@ -454,7 +653,7 @@ def build_products_report(db_path: str, start_date: date, end_date: date, unit:
 
 
 def _chart_monthly_net_sales(monthly: pd.DataFrame) -> str:
-    fig, ax = plt.subplots(figsize=(6, 3))
+    fig, ax = _chart_figure((6, 3))
     ax.plot(monthly["month"], monthly["net_sales"], marker="o", color="#0f8da0")
     ax.fill_between(monthly["month"], monthly["net_sales"], color="#7dd3d6", alpha=0.3)
     ax.set_title("Monthly Net Sales")
@@ -464,7 +663,7 @@ def _chart_monthly_net_sales(monthly: pd.DataFrame) -> str:
 
 
 def _chart_orders_units(monthly: pd.DataFrame) -> str:
-    fig, ax = plt.subplots(figsize=(6, 3))
+    fig, ax = _chart_figure((6, 3))
     ax.bar(monthly["month"], monthly["orders"], color="#7dd3d6", label="Orders")
     ax.plot(monthly["month"], monthly["units"], marker="o", color="#f7b44a", label="Bottles")
     ax.set_title("Orders & Units")
@@ -475,7 +674,7 @@ def _chart_orders_units(monthly: pd.DataFrame) -> str:
 
 
 def _chart_sales_by_channel(channel: pd.DataFrame) -> str:
-    fig, ax = plt.subplots(figsize=(6, 3))
+    fig, ax = _chart_figure((6, 3))
     ax.bar(channel["order_type"], channel["net_sales"], color="#0f8da0")
     ax.set_title("Sales by Channel")
     ax.tick_params(axis="x", labelrotation=25)
@@ -484,7 +683,7 @@ def _chart_sales_by_channel(channel: pd.DataFrame) -> str:
 
 
 def _chart_top_products(df: pd.DataFrame, value_col: str, title: str) -> str:
-    fig, ax = plt.subplots(figsize=(6, 7))
+    fig, ax = _chart_figure((6, 7))
     labels = df["sku"].fillna("")
     ax.barh(labels, df[value_col], color="#5c8ef2")
     ax.set_title(title)
@@ -494,7 +693,7 @@ def _chart_top_products(df: pd.DataFrame, value_col: str, title: str) -> str:
 
 
 def _chart_top_states(df: pd.DataFrame) -> str:
-    fig, ax = plt.subplots(figsize=(6, 3))
+    fig, ax = _chart_figure((6, 3))
     ax.bar(df["ship_state"], df["net_sales"], color="#0b6c7c")
     ax.set_title("Top States (Shipped Orders)")
     ax.spines[["top", "right"]].set_visible(False)
@@ -503,7 +702,7 @@ def _chart_top_states(df: pd.DataFrame) -> str:
 
 def _chart_customer_mix(unique_customers: int, repeat_customers: int) -> str:
     new_customers = max(unique_customers - repeat_customers, 0)
-    fig, ax = plt.subplots(figsize=(4, 3.5))
+    fig, ax = _chart_figure((4, 3.5))
     ax.pie(
         [repeat_customers, new_customers],
         labels=["Repeat", "New"],
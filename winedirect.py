@@ -1,15 +1,27 @@
 from __future__ import annotations
 
+import io
 import os
+import random
+import sqlite3
+import threading
 import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import date, datetime, time as dt_time, timedelta, timezone
+from functools import lru_cache
+from operator import itemgetter
 from zoneinfo import ZoneInfo
-from typing import Any, Dict, List
+from typing import Any, Deque, Dict, Iterator, List
 
 import requests
+from lxml import etree
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
+from urllib3.util.retry import Retry
 from zeep import Client, Settings
-from zeep.exceptions import Fault
+from zeep.cache import InMemoryCache, SqliteCache
+from zeep.exceptions import Fault, TransportError
 from zeep.helpers import serialize_object
 from zeep.transports import Transport
 
@@ -17,6 +29,203 @@ from zeep.transports import Transport
 US_BASE = "https://webservices.vin65.com"
 AU_BASE = "https://webservices.aus.vin65.com"
 PACIFIC_TZ = ZoneInfo("America/Los_Angeles")
+DETAIL_WORKERS = 8
+CHUNK_WORKERS = 4
+INFLIGHT_DETAILS = DETAIL_WORKERS
+SPLIT_WAYS = 4
+MAX_SPLIT_BACKOFF = 32
+DETAIL_PREF_RESET = 10
+WSDL_CACHE_SECONDS = 86400
+RATE_LIMIT_RETRIES = 3
+RATE_LIMIT_BACKOFF = 2.0
+MAX_RATE_LIMIT_WAIT = 3600
+MAX_FAIL_FAST_WAIT = 10
+
+XSI_NS = "http://www.w3.org/2001/XMLSchema-instance"
+SOAP_ENC_NS = "http://schemas.xmlsoap.org/soap/encoding/"
+ZEEP_SETTINGS = Settings(strict=False, xml_huge_tree=True)
+
+
+def _wait_on_rate_limit() -> bool:
+    return os.environ.get("WINE_RATE_LIMIT_WAIT", "0") == "1"
+
+
+def _env_workers(name: str, default: int) -> int:
+    value = os.environ.get(name, "").strip()
+    return max(1, int(value)) if value.isdigit() else default
+
+
+_TRUE = frozenset({"true", "1", "yes"})
+_ITEM_QUANTITY = itemgetter("quantity")
+_SAFE_DATE_FMTS = ("%Y-%m-%d", "%Y-%m-%d %H:%M:%S", "%m/%d/%Y")
+
+
+def _safe_date(value: Any) -> str:
+    if not value:
+        return ""
+    text = str(value).strip()
+    # Plain dates and naive timestamps need no parsing; anything carrying an
+    # offset goes through the slow path so it is converted to Pacific time.
+    if (
+        len(text) >= 10
+        and text[4] == "-"
+        and text[7] == "-"
+        and text[:4].isdigit()
+        and text[5:7].isdigit()
+        and text[8:10].isdigit()
+        and not any(marker in text[10:] for marker in ("Z", "+", "-"))
+    ):
+        return text[:10]
+    return _parse_date_text(text)
+
+
+@lru_cache(maxsize=1 << 16)
+def _parse_date_text(text: str) -> str:
+    # Normalize common ISO-like formats to date-only strings.
+    try:
+        iso_text = text[:-1] + "+00:00" if text.endswith("Z") else text
+        dt = datetime.fromisoformat(iso_text)
+        if dt.tzinfo is None:
+            return dt.date().isoformat()
+        return dt.astimezone(PACIFIC_TZ).date().isoformat()
+    except ValueError:
+        pass
+
+    for fmt in _SAFE_DATE_FMTS:
+        try:
+            return datetime.strptime(text, fmt).date().isoformat()
+        except ValueError:
+            continue
+
+    for sep in ("T", " "):
+        if sep in text:
+            return text.split(sep)[0]
+    return text
+
+
+def _wsdl_cache() -> SqliteCache | InMemoryCache:
+    # Default next to the app database, which is the one path the service is
+    # guaranteed to be able to write (e.g. systemd StateDirectory).
+    path = os.environ.get("WINE_WSDL_CACHE")
+    if not path:
+        db_path = os.environ.get("GB_REPORTING_DB_PATH") or os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "data", "app.db"
+        )
+        path = os.path.join(os.path.dirname(os.path.abspath(db_path)), "wsdl-cache.db")
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        return SqliteCache(path=path, timeout=WSDL_CACHE_SECONDS)
+    except (OSError, sqlite3.Error) as exc:
+        print(f"WSDL cache unavailable at {path}, caching in memory: {exc}")
+        return InMemoryCache(timeout=WSDL_CACHE_SECONDS)
+
+
+def _local_name(element) -> str:
+    return etree.QName(element).localname
+
+
+class _SoapRef:
+    """Placeholder for a SOAP-encoding href, resolved once its multiRef has been read."""
+
+    __slots__ = ("target",)
+
+    def __init__(self, target: str) -> None:
+        self.target = target
+
+
+def _xml_value(element, children: List[tuple[str, Any]]) -> Any:
+    """Convert a closed response element into the dict/list/str shape serialize_object gives."""
+    href = element.get("href")
+    if href and href.startswith("#"):
+        return _SoapRef(href[1:])
+    if element.get(f"{{{XSI_NS}}}nil") in ("true", "1"):
+        return None
+    xsi_type = element.get(f"{{{XSI_NS}}}type") or ""
+    if element.get(f"{{{SOAP_ENC_NS}}}arrayType") is not None or "Array" in xsi_type:
+        return [value for _, value in children]
+    if not children:
+        return element.text
+    result: Dict[str, Any] = {}
+    repeated = set()
+    for key, value in children:
+        if key in repeated:
+            result[key].append(value)
+        elif key in result:
+            result[key] = [result[key], value]
+            repeated.add(key)
+        else:
+            result[key] = value
+    return result
+
+
+def _parse_soap_body(content: bytes) -> tuple[Any, List[tuple[str, Any]]]:
+    """Stream-parse a SOAP envelope into its body payload and the payload's converted children.
+
+    Everything below the body is converted as soon as it closes and then dropped
+    from the tree, so a 200-order page is never held as elements and dicts at once.
+    rpc/encoded (Axis-style) responses put the data in multiRef siblings of the
+    payload; href references to them are resolved before returning.
+    """
+    body = None
+    payload = None
+    payload_children: List[tuple[str, Any]] = []
+    converted: Dict[Any, List[tuple[str, Any]]] = {}
+    refs: Dict[str, Any] = {}
+    has_refs = False
+    events = etree.iterparse(
+        io.BytesIO(content),
+        events=("start", "end"),
+        huge_tree=True,
+        resolve_entities=False,
+        no_network=True,
+    )
+    for event, element in events:
+        parent = element.getparent()
+        if event == "start":
+            if body is None and parent is not None and _local_name(parent) == "Body":
+                body = parent
+            continue
+        if body is None:
+            continue
+        if element is body:
+            break
+        has_refs = has_refs or element.get("href") is not None
+        children = converted.pop(element, [])
+        ref_id = element.get("id")
+        if parent is body:
+            if payload is None:
+                # Kept intact: the caller still reads the payload's name and attributes.
+                payload, payload_children = element, children
+            if ref_id:
+                refs[ref_id] = _xml_value(element, children)
+            if element is not payload:
+                element.clear()
+            continue
+        value = _xml_value(element, children)
+        if ref_id:
+            refs[ref_id] = value
+        converted.setdefault(parent, []).append((_local_name(element), value))
+        element.clear()
+        while element.getprevious() is not None:
+            del parent[0]
+
+    if not has_refs:
+        return payload, payload_children
+
+    def _resolve(value: Any, seen: frozenset) -> Any:
+        if isinstance(value, _SoapRef):
+            if value.target not in refs:
+                raise ValueError(f"SOAP response references missing multiRef #{value.target}")
+            if value.target in seen:
+                raise ValueError(f"SOAP response has a circular reference to #{value.target}")
+            return _resolve(refs[value.target], seen | {value.target})
+        if isinstance(value, dict):
+            return {key: _resolve(item, seen) for key, item in value.items()}
+        if isinstance(value, list):
+            return [_resolve(item, seen) for item in value]
+        return value
+
+    return payload, [(name, _resolve(value, frozenset())) for name, value in payload_children]
 
 
 class TrackingTransport(Transport):
@@ -44,6 +253,25 @@ class WineDirectClient:
         self.region = region.lower()
         self.version = version.lower()
         self.rate_limit: Dict[str, str] = {}
+        # Parse hot-path responses straight from the XML instead of through zeep's
+        # deserializer and serialize_object.
+        self.raw_soap = os.environ.get("WINE_RAW_SOAP", "0") == "1"
+        # Responses land on worker threads during parallel detail fetches.
+        self._rate_lock = threading.Lock()
+        # Retry-After of the last response seen on each thread.
+        self._response_state = threading.local()
+        # Cap on outstanding detail requests after a 429: halved on each throttle,
+        # grown by one per successful call until the configured window is back.
+        self._throttle_window: int | None = None
+        # Requests sent but not yet answered, so concurrent callers do not all
+        # spend the same rate_limit["remaining"] budget.
+        self._rate_pending = 0
+        # GetOrderDetail key (OrderNumber/OrderID) the server last accepted; tried first.
+        self._detail_pref: str | None = None
+        self._detail_pref_failures = 0
+        self._pref_lock = threading.Lock()
+        # Index into _search_products' payload attempts that worked, per IsActive filter.
+        self._product_search_pref: Dict[int | None, int] = {}
 
         base = US_BASE if self.region in ("us", "usa") else AU_BASE
         if self.version in ("v304",):
@@ -61,24 +289,114 @@ class WineDirectClient:
 
         session = requests.Session()
         session.auth = HTTPBasicAuth(self.username, self.password)
-        transport = TrackingTransport(session=session, timeout=60, on_response=self._capture_rate_limit)
+        # Every concurrent chunk search and detail request needs its own pooled
+        # connection; urllib3's default of 10 would drop and re-handshake them.
+        pool_size = _env_workers("WINE_CHUNK_WORKERS", CHUNK_WORKERS) * (_env_workers("WINE_DETAIL_WORKERS", DETAIL_WORKERS) + 1)
+        pool_size = _env_workers("WINE_POOL", max(10, pool_size))
+        # Retry dropped connections and gateway errors below zeep. SOAP faults come
+        # back as HTTP 500 and 429s are throttled in _invoke, so neither is retried here;
+        # Retry-After is ignored so urllib3 never retries a 429 or sleeps uncapped.
+        retries = Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({"GET", "POST"}),
+            respect_retry_after_header=False,
+            raise_on_status=False,
+        )
+        session.mount("https://", HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries))
+        # WSDL/XSD documents rarely change; keep them on disk so each process start
+        # does not download them again.
+        wsdl_cache = _wsdl_cache()
+        transport = TrackingTransport(
+            cache=wsdl_cache,
+            session=session,
+            timeout=60,
+            on_response=self._capture_rate_limit,
+        )
 
-        settings = Settings(strict=False, xml_huge_tree=True)
-        self.order_client = Client(self.order_wsdl, transport=transport, settings=settings)
-        self.product_client = Client(self.product_wsdl, transport=transport, settings=settings)
-        self.inventory_client = Client(self.inventory_wsdl, transport=transport, settings=settings)
+        self.order_client = Client(self.order_wsdl, transport=transport, settings=ZEEP_SETTINGS)
+        self.product_client = Client(self.product_wsdl, transport=transport, settings=ZEEP_SETTINGS)
+        self.inventory_client = Client(self.inventory_wsdl, transport=transport, settings=ZEEP_SETTINGS)
 
     def _capture_rate_limit(self, response) -> None:
         headers = getattr(response, "headers", {}) or {}
         limit = headers.get("x-rate-limit-limit")
         remaining = headers.get("x-rate-limit-remaining")
         reset = headers.get("x-rate-limit-reset")
-        if limit is not None:
-            self.rate_limit["limit"] = str(limit)
-        if remaining is not None:
-            self.rate_limit["remaining"] = str(remaining)
+        self._response_state.retry_after = headers.get("Retry-After")
         if reset is not None:
-            self.rate_limit["reset"] = str(reset)
+            try:
+                reset_value = int(reset)
+                # Epoch seconds stay below 1e10 until the year 2286; anything larger is ms.
+                if reset_value > 10_000_000_000:
+                    reset = reset_value // 1000
+            except ValueError:
+                pass
+        with self._rate_lock:
+            if limit is not None:
+                self.rate_limit["limit"] = str(limit)
+            if remaining is not None and not self._stale_remaining(str(remaining), reset):
+                self.rate_limit["remaining"] = str(remaining)
+            if reset is not None:
+                self.rate_limit["reset"] = str(reset)
+
+    def _stale_remaining(self, remaining: str, reset: Any) -> bool:
+        # Parallel responses can land out of order; within one reset window the
+        # count only goes down, so a higher value is an older response.
+        if reset is None or str(reset) != self.rate_limit.get("reset"):
+            return False
+        current = self.rate_limit.get("remaining")
+        return remaining.isdigit() and current is not None and current.isdigit() and int(remaining) > int(current)
+
+    def _seconds_until_reset(self) -> float | None:
+        with self._rate_lock:
+            reset_epoch = self.rate_limit.get("reset")
+        try:
+            reset_sec = int(reset_epoch or 0)
+        except ValueError:
+            return None
+        if reset_sec <= 0:
+            return None
+        wait_sec = max(1, reset_sec - time.time())
+        return wait_sec if wait_sec < MAX_RATE_LIMIT_WAIT else None
+
+    def _retry_delay(self, attempt: int) -> float:
+        retry_after = getattr(self._response_state, "retry_after", None)
+        if retry_after and str(retry_after).strip().isdigit():
+            delay = min(float(retry_after), MAX_RATE_LIMIT_WAIT)
+        else:
+            delay = self._seconds_until_reset() or RATE_LIMIT_BACKOFF * 2**attempt
+        return delay + random.uniform(0, 1)
+
+    def _rate_budget(self) -> int | None:
+        with self._rate_lock:
+            remaining = self.rate_limit.get("remaining")
+            try:
+                return int(remaining) - self._rate_pending
+            except (TypeError, ValueError):
+                return None
+
+    def _rate_reserve(self, future) -> None:
+        with self._rate_lock:
+            self._rate_pending += 1
+
+        def _release(_) -> None:
+            with self._rate_lock:
+                self._rate_pending -= 1
+
+        future.add_done_callback(_release)
+
+    def _throttled(self) -> None:
+        with self._rate_lock:
+            self._throttle_window = max(1, (self._throttle_window or INFLIGHT_DETAILS) // 2)
+
+    def _relax_throttle(self) -> None:
+        with self._rate_lock:
+            if self._throttle_window is not None:
+                self._throttle_window += 1
+                if self._throttle_window >= INFLIGHT_DETAILS:
+                    self._throttle_window = None
 
     @classmethod
     def from_env(cls) -> "WineDirectClient":
@@ -95,21 +413,26 @@ class WineDirectClient:
         start_date: date,
         end_date: date,
         progress_cb=None,
-    ) -> List[Dict[str, Any]]:
-        orders: List[Dict[str, Any]] = []
-        raw_orders: List[Dict[str, Any]] = []
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield normalized orders as each search page (or order detail) completes."""
+        ready: Deque[Dict[str, Any]] = deque()
+        # Search rows still waiting on their detail request, keyed by arrival index.
+        awaiting_detail: Dict[int, Dict[str, Any]] = {}
+        fetched = 0
         page = 1
         max_rows = 200
         fetch_detail = os.environ.get("WINE_FETCH_ORDER_DETAIL", "0") == "1"
         detail_budget = os.environ.get("WINE_ORDER_DETAIL_MAX", "").strip()
         max_detail = int(detail_budget) if detail_budget.isdigit() else None
         detail_count = 0
-        wait_on_rate_limit = os.environ.get("WINE_RATE_LIMIT_WAIT", "0") == "1"
+        wait_on_rate_limit = _wait_on_rate_limit()
         rate_check_interval = 5
-        detail_queue: List[tuple[int, str, float | None]] = []
+        detail_queue: Deque[tuple[int, str, float | None]] = deque()
+        date_payload = self._date_payload(start_date, end_date)
 
         def _ensure_rate_limit() -> None:
-            remaining = self.rate_limit.get("remaining")
+            with self._rate_lock:
+                remaining = self.rate_limit.get("remaining")
             if remaining is None:
                 return
             try:
@@ -120,29 +443,30 @@ class WineDirectClient:
             if wait_on_rate_limit:
                 # Sleep until rate limit resets. Do NOT call rate_limit_check() here –
                 # that burns another request and makes the situation worse.
-                reset_epoch = self.rate_limit.get("reset")
-                if reset_epoch:
-                    try:
-                        reset_sec = int(reset_epoch)
-                        if reset_sec > 2_000_000_000_000:  # milliseconds
-                            reset_sec = reset_sec // 1000
-                        if reset_sec > 0:
-                            wait_sec = max(1, reset_sec - int(time.time()))
-                            if wait_sec > 0 and wait_sec < 3600:  # cap at 1 hour
-                                time.sleep(wait_sec)
-                                return  # Retry after sleep; headers will update on next request
-                    except (ValueError, OSError):
-                        pass
+                wait_sec = self._seconds_until_reset()
                 # Fallback: sleep a conservative interval
-                time.sleep(60)
+                time.sleep((wait_sec if wait_sec is not None else 60) + random.uniform(0, 1))
+                with self._rate_lock:
+                    if wait_sec is None or self.rate_limit.get("remaining") != remaining:
+                        # No known reset (or fresh headers arrived): let only this request
+                        # through as a probe; its headers decide whether the rest may follow.
+                        return
+                    # The window has reset; let requests through until fresh headers arrive.
+                    if self.rate_limit.get("limit"):
+                        self.rate_limit["remaining"] = self.rate_limit["limit"]
+                    else:
+                        self.rate_limit.pop("remaining", None)
             else:
                 raise RuntimeError("Rate limit exhausted before next page request.")
-        while True:
-            _ensure_rate_limit()
-            response = self._search_orders(start_date, end_date, page, max_rows)
-            order_rows = response.get("Orders") or response.get("Order") or []
-            if isinstance(order_rows, dict):
-                order_rows = [order_rows]
+        workers = _env_workers("WINE_DETAIL_WORKERS", DETAIL_WORKERS)
+        # Nothing queues behind busy workers: every submission has passed the
+        # rate-limit check against a budget that is still current.
+        max_in_flight = min(workers, _env_workers("WINE_INFLIGHT_DETAILS", INFLIGHT_DETAILS))
+        in_flight: Dict[Any, tuple[int, str]] = {}
+
+        def _handle_page(response: Dict[str, Any]) -> bool:
+            nonlocal fetched
+            order_rows = self._extract_orders(response)
 
             for order in order_rows:
                 order_id = str(order.get("OrderID") or order.get("OrderId") or "")
@@ -154,9 +478,13 @@ class WineDirectClient:
                         order_number = None
                 if not order_id:
                     continue
-                raw_orders.append(order)
-                orders.append(self._normalize_order(order, {}))
-                detail_queue.append((len(orders) - 1, order_id, order_number))
+                if fetch_detail:
+                    # Normalized once the detail arrives (or fails) instead of twice.
+                    awaiting_detail[fetched] = order
+                    detail_queue.append((fetched, order_id, order_number))
+                else:
+                    ready.append(self._normalize_order(order, {}))
+                fetched += 1
 
             total_candidates = (
                 response.get("Total"),
@@ -164,77 +492,163 @@ class WineDirectClient:
                 response.get("RecordCount"),
                 response.get("TotalRecordCount"),
             )
-            total = next((int(value) for value in total_candidates if value not in (None, "")), 0)
+            total = next((int(float(value)) for value in total_candidates if value not in (None, "")), 0)
             if progress_cb is not None:
                 try:
-                    progress_cb(page, len(orders), total)
+                    progress_cb(page, fetched, total)
                 except Exception:
                     pass
             if not order_rows:
-                break
-            if total > 0 and len(orders) >= total:
-                break
+                return False
+            if total > 0 and fetched >= total:
+                return False
             if total == 0 and len(order_rows) < max_rows:
-                break
-            page += 1
+                return False
+            return True
 
-        if fetch_detail:
-            total_details = len(detail_queue)
-            detail_progress_interval = max(1, total_details // 50)  # Update ~50 times
-            for idx, order_id, order_number in detail_queue:
-                if max_detail is not None and detail_count >= max_detail:
-                    break
+        def _rate_held() -> bool:
+            # Out of budget with requests outstanding: let their responses report
+            # the real budget before sending more.
+            budget = self._rate_budget()
+            return budget is not None and budget <= 0 and bool(in_flight or search_future)
+
+        def _submit_search() -> None:
+            nonlocal search_future, search_due
+            if not search_due or search_future is not None or _rate_held():
+                return
+            _ensure_rate_limit()
+            search_future = search_executor.submit(self._search_orders, date_payload, page, max_rows)
+            self._rate_reserve(search_future)
+            search_due = False
+
+        def _submit_details() -> None:
+            # Keep a bounded window of requests outstanding and never more than
+            # the remaining detail or rate-limit budget; the rate-limit check stays
+            # on this thread so exhaustion still raises (or waits) before submitting.
+            while detail_queue and len(in_flight) < min(max_in_flight, self._throttle_window or max_in_flight):
+                if max_detail is not None and detail_count + len(in_flight) >= max_detail:
+                    return
+                if _rate_held():
+                    return
+                idx, order_id, order_number = detail_queue.popleft()
                 _ensure_rate_limit()
+                future = detail_executor.submit(self._get_order_detail, order_id, order_number)
+                self._rate_reserve(future)
+                in_flight[future] = (idx, order_id)
+
+        def _collect_detail(future) -> None:
+            nonlocal detail_count
+            idx, order_id = in_flight.pop(future)
+            order = awaiting_detail.pop(idx)
+            try:
+                detail = future.result()
+            except Exception as exc:
+                print(f"Order detail fetch failed for {order_id}: {exc}")
+                ready.append(self._normalize_order(order, {}))
+                return
+            ready.append(self._normalize_order(order, detail))
+            detail_count += 1
+            total_details = fetched
+            detail_progress_interval = max(1, total_details // 50)  # Update ~50 times
+            if progress_cb is not None and (detail_count % detail_progress_interval == 0 or detail_count == total_details):
                 try:
-                    detail = self._get_order_detail(order_id, order_number)
-                except Exception as exc:
-                    print(f"Order detail fetch failed for {order_id}: {exc}")
-                    continue
-                orders[idx] = self._normalize_order(raw_orders[idx], detail)
-                detail_count += 1
-                if progress_cb is not None and (detail_count % detail_progress_interval == 0 or detail_count == total_details):
-                    try:
-                        progress_cb(None, detail_count, total_details)  # page=None signals detail phase
-                    except Exception:
-                        pass
-        return orders
+                    progress_cb(None, detail_count, total_details)  # page=None signals detail phase
+                except Exception:
+                    pass
+
+        # Searches run one page at a time on their own thread so the detail
+        # requests for page N overlap with the search for page N + 1.
+        search_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="wine-search")
+        detail_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="wine-detail")
+        search_future = None
+        search_due = True
+        try:
+            _submit_search()
+            while search_due or search_future is not None or in_flight:
+                pending = set(in_flight)
+                if search_future is not None:
+                    pending.add(search_future)
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                if search_future in done:
+                    search_due = _handle_page(search_future.result())
+                    if search_due:
+                        page += 1
+                    search_future = None
+                for future in done:
+                    if future in in_flight:
+                        _collect_detail(future)
+                _submit_search()
+                _submit_details()
+                while ready:
+                    yield ready.popleft()
+        finally:
+            search_executor.shutdown(wait=True, cancel_futures=True)
+            detail_executor.shutdown(wait=True, cancel_futures=True)
+
+        # Orders that fell outside WINE_ORDER_DETAIL_MAX.
+        for order in awaiting_detail.values():
+            yield self._normalize_order(order, {})
 
-    def fetch_orders_chunked(self, start_date: date, end_date: date, chunk_days: int = 30) -> List[Dict[str, Any]]:
-        orders: List[Dict[str, Any]] = []
+    def fetch_orders_list(self, start_date: date, end_date: date, progress_cb=None) -> List[Dict[str, Any]]:
+        return list(self.fetch_orders(start_date, end_date, progress_cb=progress_cb))
+
+    def fetch_orders_chunked(self, start_date: date, end_date: date, chunk_days: int = 30) -> Iterator[Dict[str, Any]]:
+        """Yield orders chunk by chunk, in date order, as each chunk's search finishes."""
         if end_date < start_date:
-            return orders
+            return
 
-        stack: List[tuple[date, date]] = []
+        ranges: List[tuple[date, date]] = []
         if chunk_days and chunk_days > 0:
             cursor = start_date
             while cursor <= end_date:
                 chunk_end = min(cursor + timedelta(days=chunk_days - 1), end_date)
-                stack.append((cursor, chunk_end))
+                ranges.append((cursor, chunk_end))
                 cursor = chunk_end + timedelta(days=1)
         else:
-            stack.append((start_date, end_date))
+            ranges.append((start_date, end_date))
 
-        while stack:
-            current_start, current_end = stack.pop(0)
+        def _fetch_range(date_range: tuple[date, date]) -> List[Dict[str, Any]] | Exception:
+            # A chunk is all-or-nothing so a failure can be bisected without
+            # having yielded part of it already.
             try:
-                orders.extend(self.fetch_orders(current_start, current_end))
+                return self.fetch_orders_list(*date_range)
             except Exception as exc:
-                span_days = (current_end - current_start).days
-                if span_days <= 0:
-                    print(f"Order search failed for {current_start}: {exc}")
-                    continue
-                mid = current_start + timedelta(days=span_days // 2)
-                if mid < current_end:
-                    stack.append((current_start, mid))
-                    stack.append((mid + timedelta(days=1), current_end))
+                return exc
+
+        # Chunks are independent, so search them concurrently; results are yielded
+        # in submission order and failed ranges are bisected afterwards.
+        stack: Deque[tuple[date, date, int, Exception]] = deque()
+        workers = _env_workers("WINE_CHUNK_WORKERS", CHUNK_WORKERS)
+        with ThreadPoolExecutor(max_workers=min(workers, len(ranges)), thread_name_prefix="wine-chunk") as executor:
+            for (current_start, current_end), result in zip(ranges, executor.map(_fetch_range, ranges)):
+                if isinstance(result, Exception):
+                    stack.append((current_start, current_end, 0, result))
+                else:
+                    yield from result
+
+        # Split failing ranges four ways so a bad day is isolated in fewer
+        # rounds, backing off between rounds in case the failure is transient.
+        while stack:
+            current_start, current_end, attempt, exc = stack.popleft()
+            days = (current_end - current_start).days + 1
+            if days <= 1:
+                print(f"Order search failed for {current_start}: {exc}")
+                continue
+            time.sleep(min(MAX_SPLIT_BACKOFF, 2**attempt) + random.random())
+            parts = min(SPLIT_WAYS, days)
+            for part in range(parts):
+                part_start = current_start + timedelta(days=days * part // parts)
+                part_end = current_start + timedelta(days=days * (part + 1) // parts - 1)
+                result = _fetch_range((part_start, part_end))
+                if isinstance(result, Exception):
+                    stack.append((part_start, part_end, attempt + 1, result))
                 else:
-                    print(f"Order search failed for {current_start} to {current_end}: {exc}")
-        return orders
+                    yield from result
 
     def rate_limit_check(self) -> None:
         today = datetime.now(timezone.utc).date()
         # Minimal request to capture rate-limit headers.
-        self._search_orders(today, today, page=1, max_rows=1)
+        self._search_orders(self._date_payload(today, today), page=1, max_rows=1, rate_limit_retries=0)
 
     def fetch_products(self) -> List[Dict[str, Any]]:
         products: List[Dict[str, Any]] = []
@@ -252,7 +666,7 @@ class WineDirectClient:
                     response.get("RecordCount"),
                     response.get("TotalRecordCount"),
                 )
-                total = next((int(value) for value in total_candidates if value not in (None, "")), 0)
+                total = next((int(float(value)) for value in total_candidates if value not in (None, "")), 0)
                 if not product_rows:
                     break
                 if total > 0 and len(products) >= total and page > 1:
@@ -330,19 +744,66 @@ class WineDirectClient:
             "DateCompletedTo": end_dt.strftime("%Y-%m-%dT%H:%M:%S"),
         }
 
-    def _search_orders(self, start_date: date, end_date: date, page: int, max_rows: int) -> Dict[str, Any]:
+    def _invoke(
+        self, client: Client, operation: str, request: Dict[str, Any], retries: int = RATE_LIMIT_RETRIES
+    ) -> Dict[str, Any]:
+        wait_on_rate_limit = _wait_on_rate_limit()
+        for attempt in range(retries + 1):
+            try:
+                result = self._invoke_once(client, operation, request)
+            except (TransportError, requests.HTTPError) as exc:
+                response = getattr(exc, "response", None)
+                status = getattr(exc, "status_code", None) or getattr(response, "status_code", None)
+                if status != 429 or attempt == retries:
+                    raise
+                self._throttled()
+                delay = self._retry_delay(attempt)
+                # Without WINE_RATE_LIMIT_WAIT only ride out short bursts; a window
+                # that reopens later fails fast like an exhausted budget does.
+                if not wait_on_rate_limit and delay > MAX_FAIL_FAST_WAIT:
+                    raise
+                time.sleep(delay)
+                continue
+            self._relax_throttle()
+            return result
+        return {}
+
+    def _invoke_once(self, client: Client, operation: str, request: Dict[str, Any]) -> Dict[str, Any]:
+        if not self.raw_soap:
+            result = getattr(client.service, operation)(Request=request)
+            return serialize_object(result, target_cls=dict) or {}
+        with client.settings(raw_response=True):
+            response = getattr(client.service, operation)(Request=request)
+        try:
+            payload, children = _parse_soap_body(response.content)
+        except etree.XMLSyntaxError:
+            response.raise_for_status()
+            raise
+        if payload is None:
+            response.raise_for_status()
+            return {}
+        if _local_name(payload) == "Fault":
+            fault = dict(children)
+            raise Fault(message=fault.get("faultstring") or "Unknown fault", code=fault.get("faultcode"))
+        response.raise_for_status()
+        # Like zeep, unwrap a response element that only carries the return part.
+        value = children[0][1] if len(children) == 1 else _xml_value(payload, children)
+        return value if isinstance(value, dict) else {}
+
+    def _search_orders(
+        self, date_payload: Dict[str, str], page: int, max_rows: int, rate_limit_retries: int = RATE_LIMIT_RETRIES
+    ) -> Dict[str, Any]:
         request = {
             "Security": self._security(),
             "OrderStatus": "Completed",
             "Page": page,
             "MaxRows": max_rows,
-            **self._date_payload(start_date, end_date),
+            **date_payload,
         }
         website_ids = self._website_ids()
         if website_ids:
             request["WebsiteIDs"] = website_ids
-        result = self.order_client.service.SearchOrders(Request=request)
-        return serialize_object(result) or {}
+        return self._invoke(self.order_client, "SearchOrders", request, retries=rate_limit_retries)
 
     def _get_order_detail(self, order_id: str, order_number: float | None) -> Dict[str, Any]:
         attempts: List[Dict[str, Any]] = []
@@ -352,6 +813,9 @@ class WineDirectClient:
             attempts.append({"OrderNumber": num_val})
         if order_id:
             attempts.append({"OrderID": order_id})
+        preferred = self._detail_pref
+        if preferred is not None:
+            attempts.sort(key=lambda payload: preferred not in payload)
 
         last_exc: Exception | None = None
         for payload in attempts:
@@ -363,12 +827,24 @@ class WineDirectClient:
             website_id = self._website_ids()
             if website_id:
                 request["WebsiteID"] = website_id
+            (key,) = payload
             try:
-                result = self.order_client.service.GetOrderDetail(Request=request)
-                return serialize_object(result) or {}
+                detail = self._invoke(self.order_client, "GetOrderDetail", request)
             except Fault as exc:
                 last_exc = exc
+                if key == preferred:
+                    with self._pref_lock:
+                        self._detail_pref_failures += 1
+                        if self._detail_pref_failures >= DETAIL_PREF_RESET:
+                            self._detail_pref = None
+                            self._detail_pref_failures = 0
                 continue
+            with self._pref_lock:
+                if self._detail_pref is None:
+                    self._detail_pref = key
+                if key == self._detail_pref:
+                    self._detail_pref_failures = 0
+            return detail
         if last_exc:
             raise last_exc
         return {}
@@ -391,8 +867,8 @@ class WineDirectClient:
                 {},
             ]
         )
-        last_exc: Exception | None = None
-        for payload in attempts:
+
+        def _request(payload: Dict[str, Any]) -> Dict[str, Any]:
             request = {
                 "Security": self._security(),
                 "MaxRows": max_rows,
@@ -402,12 +878,25 @@ class WineDirectClient:
             website_ids = self._website_ids()
             if website_ids:
                 request["WebsiteIDs"] = website_ids
+            return request
+
+        # Later pages reuse the payload form that worked on the first one; an empty
+        # page there is the end of the listing, not a reason to loosen the filter.
+        preferred = self._product_search_pref.get(is_active)
+        if preferred is not None:
+            try:
+                return self._invoke(self.product_client, "SearchProducts", _request(attempts[preferred]))
+            except Fault:
+                del self._product_search_pref[is_active]
+
+        last_exc: Exception | None = None
+        for index, payload in enumerate(attempts):
             try:
-                result = self.product_client.service.SearchProducts(Request=request)
-                data = serialize_object(result) or {}
+                data = self._invoke(self.product_client, "SearchProducts", _request(payload))
                 # If a filtered request returns no products, try a looser payload.
                 if payload and not self._extract_products(data):
                     continue
+                self._product_search_pref[is_active] = index
                 return data
             except Fault as exc:
                 last_exc = exc
@@ -416,6 +905,15 @@ class WineDirectClient:
             raise last_exc
         return {}
 
+    @staticmethod
+    def _extract_orders(response: Dict[str, Any]) -> List[Dict[str, Any]]:
+        orders = response.get("Orders") or response.get("Order") or []
+        if isinstance(orders, dict) and "Order" in orders:
+            orders = orders["Order"]
+        if isinstance(orders, dict):
+            orders = [orders]
+        return orders or []
+
     @staticmethod
     def _extract_products(response: Dict[str, Any]) -> List[Dict[str, Any]]:
         products = response.get("Products") or response.get("Product") or []
@@ -441,7 +939,7 @@ class WineDirectClient:
         if website_ids:
             request["WebsiteIDs"] = website_ids
         result = self.inventory_client.service.SearchInventory(Request=request)
-        return serialize_object(result) or {}
+        return serialize_object(result, target_cls=dict) or {}
 
     @staticmethod
     def _extract_inventory(response: Dict[str, Any]) -> List[Dict[str, Any]]:
@@ -458,27 +956,11 @@ class WineDirectClient:
         ship_to = order_info.get("ShipToAddress") or {}
         items = self._extract_items(order_info)
 
-        units = sum(item.get("quantity", 0) for item in items)
+        units = sum(map(_ITEM_QUANTITY, items))
         net_sales = 0.0
-
-        def _get(key: str, fallback: Any = 0):
-            return order_info.get(key, order.get(key, fallback))
-
-        def _clean_number(value: Any) -> str:
-            if value is None:
-                return ""
-            if isinstance(value, float):
-                if value.is_integer():
-                    return str(int(value))
-                return str(value)
-            text = str(value).strip()
-            try:
-                num = float(text)
-            except ValueError:
-                return text
-            if num.is_integer():
-                return str(int(num))
-            return text
+        # Detail fields win over search fields; merge once instead of doing two
+        # lookups for each of the ~60 fields below.
+        _get = {**order, **order_info}.get if order_info else order.get
 
         total = self._safe_float(_get("Total") or _get("OrderTotal") or 0)
         taxes = self._safe_float(_get("Tax") or _get("TaxTotal") or _get("OrderTax") or 0)
@@ -488,12 +970,12 @@ class WineDirectClient:
         net_sales = sub_total if sub_total else max(total - taxes - shipping - tip, 0)
 
         return {
-            "order_id": str(_get("OrderID", order.get("OrderID")) or ""),
-            "order_number": _clean_number(_get("OrderNumber", order.get("OrderNumber"))),
-            "completed_date": self._safe_date(_get("DateCompleted") or _get("CompletedDate") or ""),
-            "submitted_date": self._safe_date(_get("DateSubmitted") or _get("SubmittedDate") or ""),
-            "date_modified": self._safe_date(_get("DateModified") or ""),
-            "shipped_date": self._safe_date(_get("DateShipped") or _get("ShippedDate") or ""),
+            "order_id": str(_get("OrderID") or ""),
+            "order_number": self._clean_number(_get("OrderNumber")),
+            "completed_date": _safe_date(_get("DateCompleted") or _get("CompletedDate") or ""),
+            "submitted_date": _safe_date(_get("DateSubmitted") or _get("SubmittedDate") or ""),
+            "date_modified": _safe_date(_get("DateModified") or ""),
+            "shipped_date": _safe_date(_get("DateShipped") or _get("ShippedDate") or ""),
             "order_type": _get("Type") or _get("OrderType") or _get("OrderSource") or "Unknown",
             "order_status": _get("OrderStatus") or "",
             "ship_state": _get("ShipStateCode") or _get("ShippingState") or "Unknown",
@@ -525,12 +1007,12 @@ class WineDirectClient:
             "shipping_type": _get("ShippingType") or "",
             "tracking_number": _get("TrackingNumber") or "",
             "website_id": _get("WebsiteID") or "",
-            "is_external_order": str(_get("IsExternalOrder") or "").lower() in ("true", "1", "yes"),
-            "is_pending_pickup": str(_get("IsPendingPickup") or "").lower() in ("true", "1", "yes"),
-            "is_arms_order": str(_get("IsARMSOrder") or "").lower() in ("true", "1", "yes"),
-            "pickup": str(_get("IsAPickupOrder") or _get("Pickup") or "").lower() in ("yes", "true", "1"),
-            "order_number_long": _clean_number(_get("OrderNumberLong") or ""),
-            "pickup_date": self._safe_date(_get("PickupDate") or ""),
+            "is_external_order": str(_get("IsExternalOrder") or "").lower() in _TRUE,
+            "is_pending_pickup": str(_get("IsPendingPickup") or "").lower() in _TRUE,
+            "is_arms_order": str(_get("IsARMSOrder") or "").lower() in _TRUE,
+            "pickup": str(_get("IsAPickupOrder") or _get("Pickup") or "").lower() in _TRUE,
+            "order_number_long": self._clean_number(_get("OrderNumberLong") or ""),
+            "pickup_date": _safe_date(_get("PickupDate") or ""),
             "pickup_location_code": _get("PickupLocationCode") or "",
             "payment_terms": _get("PaymentTerms") or "",
             "price_level": _get("PriceLevel") or "",
@@ -539,10 +1021,10 @@ class WineDirectClient:
             "transaction_type": _get("TransactionType") or "",
             "source_code": _get("SourceCode") or "",
             "wholesale_number": _get("WholesaleNumber") or "",
-            "requested_delivery_date": self._safe_date(_get("RequestedDeliveryDate") or ""),
-            "requested_ship_date": self._safe_date(_get("RequestedShipDate") or ""),
-            "sent_to_fulfillment_date": self._safe_date(_get("SentToFulfillmentDate") or ""),
-            "future_ship_date": self._safe_date(_get("FutureShipDate") or ""),
+            "requested_delivery_date": _safe_date(_get("RequestedDeliveryDate") or ""),
+            "requested_ship_date": _safe_date(_get("RequestedShipDate") or ""),
+            "sent_to_fulfillment_date": _safe_date(_get("SentToFulfillmentDate") or ""),
+            "future_ship_date": _safe_date(_get("FutureShipDate") or ""),
             "marketplace": _get("Marketplace") or "",
             "order_total": total,
             "taxes": taxes,
@@ -558,6 +1040,23 @@ class WineDirectClient:
             "raw_json": order_info,
         }
 
+    @staticmethod
+    def _clean_number(value: Any) -> str:
+        if value is None:
+            return ""
+        if isinstance(value, float):
+            if value.is_integer():
+                return str(int(value))
+            return str(value)
+        text = str(value).strip()
+        try:
+            num = float(text)
+        except ValueError:
+            return text
+        if num.is_integer():
+            return str(int(num))
+        return text
+
     def _extract_items(self, order_info: Dict[str, Any]) -> List[Dict[str, Any]]:
         for key in ("OrderItems", "Items", "OrderItem"):
             if key in order_info:
@@ -566,42 +1065,43 @@ class WineDirectClient:
                     items = items["OrderItem"]
                 if isinstance(items, dict):
                     items = [items]
-                return [self._normalize_item(item) for item in items]
+                return [self._normalize_item(item) for item in items or [] if isinstance(item, dict)]
         return []
 
     def _normalize_item(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        get = item.get
         return {
-            "sku": item.get("SKU") or item.get("ProductSKU") or item.get("Sku") or "",
-            "name": item.get("ProductName") or item.get("Name") or "",
-            "quantity": self._safe_float(item.get("Quantity") or item.get("Qty") or 0),
-            "net_sales": self._safe_float(item.get("ExtItemPrice") or item.get("ExtendedPrice") or item.get("Price") or 0),
-            "product_id": item.get("ProductID") or "",
-            "product_skuid": item.get("ProductSKUID") or "",
-            "price": self._safe_float(item.get("Price") or 0),
-            "original_price": self._safe_float(item.get("OriginalPrice") or 0),
-            "department": item.get("Department") or "",
-            "department_code": item.get("DepartmentCode") or "",
-            "inventory_pool": item.get("InventoryPool") or "",
-            "is_non_taxable": str(item.get("IsNonTaxable") or "").lower() in ("true", "1", "yes"),
-            "is_subsku": str(item.get("IsSubSKU") or "").lower() in ("true", "1", "yes"),
-            "sales_tax": self._safe_float(item.get("SalesTax") or 0),
-            "shipping_sku": item.get("ShippingSKU") or "",
-            "shipping_service": item.get("ShippingService") or "",
-            "sub_department": item.get("SubDepartment") or "",
-            "sub_department_code": item.get("SubDepartmentCode") or "",
-            "subtitle": item.get("SubTitle") or "",
-            "title": item.get("Title") or "",
-            "item_type": item.get("Type") or "",
-            "unit_description": item.get("UnitDescription") or "",
-            "weight": self._safe_float(item.get("Weight") or 0),
-            "cost_of_good": self._safe_float(item.get("CostOfGood") or 0),
-            "custom_tax1": self._safe_float(item.get("CustomTax1") or 0),
-            "custom_tax2": self._safe_float(item.get("CustomTax2") or 0),
-            "custom_tax3": self._safe_float(item.get("CustomTax3") or 0),
-            "parent_sku": item.get("ParentSKU") or "",
-            "parent_skuid": item.get("ParentSKUID") or "",
-            "shipped_date": self._safe_date(item.get("ShippedDate") or ""),
-            "tracking_number": item.get("TrackingNumber") or "",
+            "sku": get("SKU") or get("ProductSKU") or get("Sku") or "",
+            "name": get("ProductName") or get("Name") or "",
+            "quantity": self._safe_float(get("Quantity") or get("Qty") or 0),
+            "net_sales": self._safe_float(get("ExtItemPrice") or get("ExtendedPrice") or get("Price") or 0),
+            "product_id": get("ProductID") or "",
+            "product_skuid": get("ProductSKUID") or "",
+            "price": self._safe_float(get("Price") or 0),
+            "original_price": self._safe_float(get("OriginalPrice") or 0),
+            "department": get("Department") or "",
+            "department_code": get("DepartmentCode") or "",
+            "inventory_pool": get("InventoryPool") or "",
+            "is_non_taxable": str(get("IsNonTaxable") or "").lower() in _TRUE,
+            "is_subsku": str(get("IsSubSKU") or "").lower() in _TRUE,
+            "sales_tax": self._safe_float(get("SalesTax") or 0),
+            "shipping_sku": get("ShippingSKU") or "",
+            "shipping_service": get("ShippingService") or "",
+            "sub_department": get("SubDepartment") or "",
+            "sub_department_code": get("SubDepartmentCode") or "",
+            "subtitle": get("SubTitle") or "",
+            "title": get("Title") or "",
+            "item_type": get("Type") or "",
+            "unit_description": get("UnitDescription") or "",
+            "weight": self._safe_float(get("Weight") or 0),
+            "cost_of_good": self._safe_float(get("CostOfGood") or 0),
+            "custom_tax1": self._safe_float(get("CustomTax1") or 0),
+            "custom_tax2": self._safe_float(get("CustomTax2") or 0),
+            "custom_tax3": self._safe_float(get("CustomTax3") or 0),
+            "parent_sku": get("ParentSKU") or "",
+            "parent_skuid": get("ParentSKUID") or "",
+            "shipped_date": _safe_date(get("ShippedDate") or ""),
+            "tracking_number": get("TrackingNumber") or "",
             "raw_json": item,
         }
 
@@ -611,30 +1111,3 @@ class WineDirectClient:
             return float(value)
         except (TypeError, ValueError):
             return 0.0
-
-    @staticmethod
-    def _safe_date(value: Any) -> str:
-        if not value:
-            return ""
-        text = str(value).strip()
-        # Normalize common ISO-like formats to date-only strings.
-        try:
-            iso_text = text.replace("Z", "+00:00")
-            dt = datetime.fromisoformat(iso_text)
-            if dt.tzinfo is None:
-                return dt.date().isoformat()
-            return dt.astimezone(PACIFIC_TZ).date().isoformat()
-        except ValueError:
-            pass
-
-        for fmt in ("%Y-%m-%d", "%Y-%m-%d %H:%M:%S", "%m/%d/%Y"):
-            try:
-                return datetime.strptime(text, fmt).date().isoformat()
-            except ValueError:
-                continue
-
-        for sep in ("T", " "):
-            if sep in text:
-                return text.split(sep)[0]
-        return text
-